@@ -7,7 +7,7 @@ to download invoices for each.
 
 Prerequisites:
   - Chrome running with CDP on port 9222
-  - Already logged in (run att_login.py first)
+  - Already logged in (run att_login.py first, or pass --login)
 
 Flow:
   1. Navigate to account overview
@@ -24,8 +24,9 @@ Output: ~/invoices/att/pdfs/ATTBill_NNNN_MonYYYY.pdf
 Usage:
   python3 att_download_bills.py
   python3 att_download_bills.py --only-new  # Skip bills already downloaded
+  python3 att_download_bills.py --login     # Log in first (same connection) if session expired
 """
-import asyncio, os, sys
+import asyncio, os, re, sys
 from pathlib import Path
 
 try:
@@ -34,65 +35,147 @@ except ImportError:
     print("Missing: pip install playwright")
     sys.exit(1)
 
+# Optional: uvloop's libuv event loop lowers per-message overhead on CDP traffic
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 CDP_URL = os.environ.get("ATT_CDP_URL", "http://127.0.0.1:9222")
 SAVE_DIR = Path(os.environ.get("ATT_PDF_DIR", Path.home() / "invoices" / "att" / "pdfs"))
 ONLY_NEW = "--only-new" in sys.argv
+LOGIN = "--login" in sys.argv
+
+# Row-text normalization (collapse whitespace runs), applied in-page. Shared by the
+# row read and the pagination wait so both produce identical strings.
+NORM_TEXT_JS = r"e => e.innerText.replace(/\s+/g, ' ').trim()"
+
+# AT&T names PDFs ATTBill_NNNN_MonYYYY.pdf; bill rows mention the statement month
+BILL_FILE_RE = re.compile(r'^ATTBill_(\w+?)_[A-Z][a-z]{2}\d{4}\.pdf$')
+BILL_MONTH_RE = re.compile(
+    r'\b(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.?\s+(?:\d{1,2},?\s+)?(\d{4})\b')
 
 
-async def download_bill(page, row_index):
-    """Expand a bill row, download its Regular PDF, collapse it."""
-    rows = page.locator('.titleBill')
-    count = await rows.count()
-    if row_index >= count:
+def expected_filename(txt, acct_suffix):
+    """Predict the PDF name for a bill row, or None if it can't be inferred."""
+    if not acct_suffix:
         return None
+    m = BILL_MONTH_RE.search(txt)
+    if not m:
+        return None
+    return f"ATTBill_{acct_suffix}_{m.group(1)}{m.group(2)}.pdf"
 
-    row = rows.nth(row_index)
-    txt = (await row.inner_text()).strip().replace('\n', ' ')
-    print(f'[{row_index}] {txt}', flush=True)
 
-    # Click to expand
-    await row.click()
-    await asyncio.sleep(2)
+def account_suffix(acct_id):
+    """Best guess at the NNNN in ATTBill_NNNN_*: last 4 digits of the account number."""
+    digits = re.sub(r'\D', '', acct_id)
+    return digits[-4:] if len(digits) >= 4 else None
 
-    # Find "Download PDF" button
-    dl_btn = page.locator('button:has-text("Download PDF"):visible')
-    if await dl_btn.count() == 0:
-        print(f'  No Download PDF button', flush=True)
-        return None
 
-    # Click to open dropdown
-    await dl_btn.first.click()
-    await asyncio.sleep(1)
+async def succeeded(aw):
+    """Await a Playwright wait; True if it completed, False if it timed out or failed."""
+    try:
+        await aw
+        return True
+    except Exception:
+        return False
+
 
-    # Click "Regular PDF" in dropdown
-    reg = page.locator('text=Regular PDF')
-    if await reg.count() == 0:
-        print(f'  No Regular PDF option', flush=True)
-        return None
+async def wait_for_settle(page, timeout=10000):
+    """Wait for network idle, tolerating pages whose trackers never go fully quiet."""
+    try:
+        await page.wait_for_load_state("networkidle", timeout=timeout)
+    except Exception:
+        pass
 
+
+async def wait_for_collapse(page):
+    """Wait for an expanded bill row's Download PDF button to disappear."""
     try:
+        await page.locator('button:has-text("Download PDF"):visible').first.wait_for(
+            state="hidden", timeout=5000)
+    except Exception:
+        pass
+
+
+async def save_download(dl, save_path):
+    """Move a finished download into place, copying only if a rename isn't possible."""
+    try:
+        os.replace(await dl.path(), save_path)
+    except Exception:
+        # Cross-filesystem temp dir, or path() unavailable for this connection
+        await dl.save_as(save_path)
+
+
+async def save_worker(saves, existing, failed):
+    """Consumer: finish queued downloads to disk while the page moves on to the next row."""
+    while True:
+        dl, filename = await saves.get()
+        try:
+            await save_download(dl, str(SAVE_DIR / filename))
+            print(f'  ✓ {filename}', flush=True)
+        except Exception as e:
+            existing.discard(filename)
+            failed.add(filename)
+            print(f'  ✗ {filename}: {e}', flush=True)
+        finally:
+            saves.task_done()
+
+
+async def download_bill(page, row, row_index, txt, existing, saves, already_expanded=False):
+    """Expand a bill row, start its Regular PDF download, collapse it.
+
+    `row` is the row's Locator and `txt` its already-read text, both resolved
+    once per page by the caller. `existing` is the set of filenames on disk (or
+    queued). The started download is put on `saves` for save_worker to finish,
+    so the next row's clicks overlap the PDF transfer. Pass already_expanded=True
+    for a row the page opened on its own.
+    """
+    print(f'[{row_index}] {txt}', flush=True)
+    dl_btn = page.locator('button:has-text("Download PDF"):visible')
+
+    # Click to expand (unless already open), wait for "Download PDF" button
+    if not already_expanded:
+        await row.click()
+        try:
+            await dl_btn.first.wait_for(state="visible")
+        except Exception:
+            print(f'  No Download PDF button', flush=True)
+            return None
+
+    try:
+        # Click to open dropdown, wait for "Regular PDF"
+        await dl_btn.first.click()
+        reg = page.locator('text=Regular PDF')
+        try:
+            await reg.first.wait_for(state="visible", timeout=5000)
+        except Exception:
+            print(f'  No Regular PDF option', flush=True)
+            return None
+
         async with page.expect_download(timeout=20000) as dl_info:
             await reg.first.click()
         dl = await dl_info.value
         filename = dl.suggested_filename
-        save_path = str(SAVE_DIR / filename)
 
-        if ONLY_NEW and os.path.exists(save_path):
+        if ONLY_NEW and filename in existing:
             print(f'  ⊘ Already exists: {filename}', flush=True)
             # Cancel download
             await dl.cancel()
         else:
-            await dl.save_as(save_path)
-            print(f'  ✓ {filename}', flush=True)
-
-        await asyncio.sleep(1)
-        # Collapse row
-        await row.click()
-        await asyncio.sleep(1)
+            existing.add(filename)
+            await saves.put((dl, filename))
         return filename
     except Exception as e:
         print(f'  ✗ {e}', flush=True)
         return None
+    finally:
+        # Collapse row so the next row's Download PDF button is the only visible one
+        try:
+            await row.click()
+            await wait_for_collapse(page)
+        except Exception:
+            pass
 
 
 async def go_to_overview(page):
@@ -100,7 +183,7 @@ async def go_to_overview(page):
     if 'acctmgmt/overview' not in page.url:
         print("Navigating to account overview...", flush=True)
         await page.goto("https://www.att.com/acctmgmt/overview", wait_until="domcontentloaded")
-        await asyncio.sleep(5)
+        await wait_for_settle(page)
 
     if 'signin' in page.url or 'login' in page.url:
         print("ERROR: Not logged in. Run att_login.py first.", flush=True)
@@ -118,19 +201,16 @@ async def discover_accounts(page):
     accounts = []
     # AT&T shows account tiles as divs with class containing 'nopad round text-center'
     # Each has the account number and type (Wireless, Internet, etc.)
-    tiles = page.locator('div.jsx-861ccca5379a9b62')
-    count = await tiles.count()
+    # All tile texts in one round-trip
+    tile_texts = await page.eval_on_selector_all(
+        'div.jsx-861ccca5379a9b62', "els => els.map(e => e.innerText)")
 
-    if count == 0:
-        # Fallback: look for any element with account-like numbers
-        # The active account is shown in the page content
-        text = await page.inner_text('body')
+    if not tile_texts:
+        # Fallback: the active account is shown in the page content
         print("No account tiles found — using current account only", flush=True)
         return [{"id": "current", "type": "unknown"}]
 
-    for i in range(count):
-        tile = tiles.nth(i)
-        txt = (await tile.inner_text()).strip()
+    for i, txt in enumerate(tile_texts):
         lines = [l.strip() for l in txt.split('\n') if l.strip()]
         acct_id = lines[0] if lines else "unknown"
         acct_type = lines[1] if len(lines) > 1 else "unknown"
@@ -152,7 +232,7 @@ async def switch_to_account(page, account):
 
     await tile.click()
     print(f"  Switched to account {account['id']} ({account['type']})", flush=True)
-    await asyncio.sleep(5)
+    await wait_for_settle(page)
     return True
 
 
@@ -169,18 +249,26 @@ async def navigate_to_bill_history(page):
     if await billing_link.count() == 0:
         billing_link = page.locator('a[href="/acctmgmt/billing/mybillingcenter"]').first
 
+    # Route change and "See all statements" render are awaited concurrently
+    see_all = page.locator('a:has-text("See all statements")')
     await billing_link.click()
     print("Clicked billing link", flush=True)
-    await asyncio.sleep(8)
+    _, found = await asyncio.gather(
+        succeeded(page.wait_for_url("**/mybillingcenter**")),
+        succeeded(see_all.first.wait_for(state="visible", timeout=15000)),
+    )
 
-    # Click "See all statements"
-    see_all = page.locator('a:has-text("See all statements")')
-    if await see_all.count() > 0:
+    # Click "See all statements", then await history route + bill rows together
+    if found:
         await see_all.first.click()
         print("Clicked 'See all statements'", flush=True)
-        await asyncio.sleep(5)
+        await asyncio.gather(
+            succeeded(page.wait_for_url("**/billandpaymenthistory**")),
+            succeeded(page.locator('.titleBill').first.wait_for(state="visible", timeout=15000)),
+        )
     else:
         print("'See all statements' not found — may already be on history page", flush=True)
+        await succeeded(page.locator('.titleBill').first.wait_for(state="visible", timeout=15000))
 
     if 'billandpaymenthistory' in page.url:
         print(f"On bill history page: {page.url}", flush=True)
@@ -190,73 +278,159 @@ async def navigate_to_bill_history(page):
         return True
 
 
-async def download_all_bills_for_current_account(page):
-    """Download all bill PDFs for whichever account is currently active."""
+async def download_all_bills_for_current_account(page, existing, acct_suffix=None):
+    """Download all bill PDFs for whichever account is currently active.
+
+    This coroutine is the producer: it walks the rows and starts each download,
+    while a save_worker consumer finishes them to disk through a bounded queue.
+
+    With --only-new, rows whose predicted filename is already in `existing` are
+    skipped without any clicks. `acct_suffix` seeds the prediction and is
+    corrected from the first real download.
+    """
     saved = []
     page_num = 1
     seen_bills = set()
 
-    while True:
-        rows = page.locator('.titleBill')
-        count = await rows.count()
-        print(f'\n  Page {page_num}: {count} bills', flush=True)
-
-        if count == 0:
-            print("  No bills found on this page.", flush=True)
-            break
-
-        # Detect loops — check if first bill on this page was already seen
-        first_txt = (await rows.nth(0).inner_text()).strip().replace('\n', ' ')
-        if first_txt in seen_bills:
-            print("  Loop detected — already processed this page. Stopping.", flush=True)
-            break
-        for i in range(count):
-            seen_bills.add((await rows.nth(i).inner_text()).strip().replace('\n', ' '))
-
-        # Check if first row is already expanded
-        dl_vis = page.locator('button:has-text("Download PDF"):visible')
-        start_idx = 0
-        if await dl_vis.count() > 0:
-            print(f'  [0] Already expanded', flush=True)
-            await dl_vis.first.click()
-            await asyncio.sleep(1)
-            reg = page.locator('text=Regular PDF')
-            if await reg.count() > 0:
-                try:
-                    async with page.expect_download(timeout=20000) as dl_info:
-                        await reg.first.click()
-                    dl = await dl_info.value
-                    save_path = str(SAVE_DIR / dl.suggested_filename)
-                    if ONLY_NEW and os.path.exists(save_path):
-                        print(f'    ⊘ Already exists: {dl.suggested_filename}', flush=True)
-                        await dl.cancel()
-                    else:
-                        await dl.save_as(save_path)
-                        print(f'    ✓ {dl.suggested_filename}', flush=True)
-                    saved.append(dl.suggested_filename)
-                except Exception as e:
-                    print(f'    ✗ {e}', flush=True)
-            await asyncio.sleep(1)
-            first_row = rows.nth(0)
-            await first_row.click()
-            await asyncio.sleep(1)
-            start_idx = 1
-
-        for i in range(start_idx, count):
-            name = await download_bill(page, i)
+    def already_have(txt):
+        name = expected_filename(txt, acct_suffix) if ONLY_NEW else None
+        if name in existing:
+            print(f'  ⊘ Already exists: {name}', flush=True)
+            return True
+        return False
+
+    def learn_suffix(filename):
+        nonlocal acct_suffix
+        m = BILL_FILE_RE.match(filename)
+        if m:
+            acct_suffix = m.group(1)
+
+    async def fetch(row, i, txt, already_expanded=False):
+        """download_bill with one retry; the row is collapsed again after a failure."""
+        for _ in range(2):
+            name = await download_bill(page, row, i, txt, existing, saves, already_expanded)
             if name:
                 saved.append(name)
+                learn_suffix(name)
+                return
+            already_expanded = False
+
+    # Clicks stay serial (one page), but downloads finish in the background
+    saves = asyncio.Queue(maxsize=4)
+    failed = set()
+    worker = asyncio.create_task(save_worker(saves, existing, failed))
+    try:
+        while True:
+            rows = page.locator('.titleBill')
+            # All row texts in one round-trip (also gives the row count)
+            texts = await page.eval_on_selector_all('.titleBill', f"els => els.map({NORM_TEXT_JS})")
+            count = len(texts)
+            print(f'\n  Page {page_num}: {count} bills', flush=True)
+
+            if count == 0:
+                print("  No bills found on this page.", flush=True)
+                break
+
+            # Detect loops — check if first bill on this page was already seen
+            first_txt = texts[0]
+            if first_txt in seen_bills:
+                print("  Loop detected — already processed this page. Stopping.", flush=True)
+                break
+            seen_bills.update(texts)
+
+            # Check if first row is already expanded
+            start_idx = 0
+            if await page.locator('button:has-text("Download PDF"):visible').count() > 0:
+                print(f'  [0] Already expanded', flush=True)
+                if already_have(texts[0]):
+                    await rows.nth(0).click()
+                    await wait_for_collapse(page)
+                else:
+                    await fetch(rows.nth(0), 0, texts[0], already_expanded=True)
+                start_idx = 1
+
+            for i in range(start_idx, count):
+                if already_have(texts[i]):
+                    continue
+                await fetch(rows.nth(i), i, texts[i])
+
+            # Check for next page
+            next_link = page.locator('a:has-text("Next")')
+            if await next_link.count() > 0:
+                await next_link.first.click()
+                # Wait until the first row changes (loop detection covers a no-op click)
+                try:
+                    await page.wait_for_function(
+                        f"""prev => {{
+                            const r = document.querySelector('.titleBill');
+                            return r && ({NORM_TEXT_JS})(r) !== prev;
+                        }}""", arg=first_txt, timeout=15000)
+                except Exception:
+                    pass
+                page_num += 1
+            else:
+                break
+
+        await saves.join()
+    finally:
+        worker.cancel()
+
+    return [name for name in saved if name not in failed]
+
+
+async def get_page(browser):
+    """Return (context, page) for the logged-in Chrome profile.
+
+    Prefers an existing att.com tab, then any tab, and opens one only if Chrome
+    has none (instead of failing on pages[0]).
+    """
+    ctx = browser.contexts[0] if browser.contexts else await browser.new_context()
+    # Short defaults so a stuck row fails (and retries) fast; longer waits are explicit
+    ctx.set_default_timeout(8000)
+    ctx.set_default_navigation_timeout(15000)
+    page = next((p for p in ctx.pages if "att.com" in p.url), None)
+    if page is None:
+        page = ctx.pages[0] if ctx.pages else await ctx.new_page()
+    return ctx, page
+
+
+async def process_account(ctx, acct, existing):
+    """Switch to an account in its own tab and download all its bills.
+
+    Tabs share the logged-in context's cookies; a fresh BrowserContext would not.
+    Returns (label, saved) where saved is None if the account could not be reached.
+    """
+    acct_label = f"{acct['id']} ({acct.get('type', '?')})"
+    print(f"\n{'=' * 50}", flush=True)
+    print(f"Account: {acct_label}", flush=True)
+    print(f"{'=' * 50}", flush=True)
 
-        # Check for next page
-        next_link = page.locator('a:has-text("Next")')
-        if await next_link.count() > 0:
-            await next_link.first.click()
-            await asyncio.sleep(5)
-            page_num += 1
-        else:
-            break
+    page = await ctx.new_page()
+    try:
+        # Switch to this account (go to overview first)
+        if not await go_to_overview(page):
+            print(f"  Failed to navigate to overview for {acct_label}", flush=True)
+            return acct_label, None
 
-    return saved
+        if not await switch_to_account(page, acct):
+            print(f"  Failed to switch to {acct_label}", flush=True)
+            return acct_label, None
+
+        # Navigate to bill history for this account
+        if not await navigate_to_bill_history(page):
+            print(f"  Failed to reach bill history for {acct_label}", flush=True)
+            return acct_label, None
+
+        # Download all bills
+        saved = await download_all_bills_for_current_account(
+            page, existing, account_suffix(acct["id"]))
+        print(f"\n  {acct_label}: {len(saved)} bills downloaded", flush=True)
+        return acct_label, saved
+    except Exception as e:
+        print(f"  ✗ {acct_label}: {e}", flush=True)
+        return acct_label, None
+    finally:
+        await page.close()
 
 
 async def main():
@@ -271,42 +445,30 @@ async def main():
         await pw.stop()
         sys.exit(1)
 
-    page = browser.contexts[0].pages[0]
+    ctx, page = await get_page(browser)
 
     # Go to account overview to discover all accounts
     if not await go_to_overview(page):
-        await pw.stop()
-        sys.exit(1)
+        logged_in = False
+        if LOGIN:
+            # Log in on this same connection so login → download is one session
+            from att_login import login
+            print("Logging in...", flush=True)
+            logged_in = await login(page=page) and await go_to_overview(page)
+        if not logged_in:
+            await pw.stop()
+            sys.exit(1)
+
+    # Filenames already on disk (one directory read), kept current as files are saved
+    existing = {p.name for p in SAVE_DIR.glob("*.pdf")}
 
     accounts = await discover_accounts(page)
     print(f"\nFound {len(accounts)} account(s)", flush=True)
 
-    all_saved = {}
-
-    for acct in accounts:
-        acct_label = f"{acct['id']} ({acct.get('type', '?')})"
-        print(f"\n{'=' * 50}", flush=True)
-        print(f"Account: {acct_label}", flush=True)
-        print(f"{'=' * 50}", flush=True)
-
-        # Switch to this account (go to overview first)
-        if not await go_to_overview(page):
-            print(f"  Failed to navigate to overview for {acct_label}", flush=True)
-            continue
-
-        if not await switch_to_account(page, acct):
-            print(f"  Failed to switch to {acct_label}", flush=True)
-            continue
-
-        # Navigate to bill history for this account
-        if not await navigate_to_bill_history(page):
-            print(f"  Failed to reach bill history for {acct_label}", flush=True)
-            continue
-
-        # Download all bills
-        saved = await download_all_bills_for_current_account(page)
-        all_saved[acct_label] = saved
-        print(f"\n  {acct_label}: {len(saved)} bills downloaded", flush=True)
+    # One account at a time: the active account is part of the shared session,
+    # so tabs switching accounts concurrently could file bills under the wrong one
+    results = [await process_account(ctx, acct, existing) for acct in accounts]
+    all_saved = {label: saved for label, saved in results if saved is not None}
 
     # Summary
     print(f"\n{'=' * 50}", flush=True)
@@ -321,15 +483,23 @@ async def main():
 
     print(f"\nTotal: {total} bills downloaded to {SAVE_DIR}", flush=True)
 
-    # List all PDFs in save dir
-    all_pdfs = sorted(SAVE_DIR.glob("*.pdf"))
+    # List all PDFs in save dir (scandir entries cache stat info from the dir read)
+    with os.scandir(SAVE_DIR) as it:
+        all_pdfs = sorted((e for e in it if e.name.endswith(".pdf") and e.is_file()),
+                          key=lambda e: e.name)
     if all_pdfs:
         print(f"\nAll PDFs in {SAVE_DIR}:", flush=True)
-        for p in all_pdfs:
-            size_kb = p.stat().st_size / 1024
-            print(f"  {p.name} ({size_kb:.0f} KB)", flush=True)
+        for e in all_pdfs:
+            size_kb = e.stat().st_size / 1024
+            print(f"  {e.name} ({size_kb:.0f} KB)", flush=True)
 
     await pw.stop()
 
 
-asyncio.run(main())
+if uvloop is None:
+    asyncio.run(main())
+elif hasattr(uvloop, "run"):
+    uvloop.run(main())
+else:
+    uvloop.install()  # uvloop<0.18 has no run()
+    asyncio.run(main())
@@ -7,7 +7,7 @@ Flow: att.com/acctmgmt/signin → username → password → MFA → account over
 MFA code delivery:
   - Agent asks human for the code sent to their phone
   - Code is written to ~/invoices/att/mfa_code.txt
-  - This script polls that file and submits the code
+  - This script waits for that file and submits the code
 
 Status updates written to ~/invoices/att/status.txt
 
@@ -15,18 +15,24 @@ Usage:
   python3 att_login.py              # Full login + MFA
   python3 att_login.py --skip-mfa   # Login only (if session still active)
 """
-import os, sys, time, random, subprocess
+import asyncio, os, sys, time, random, subprocess
 from pathlib import Path
 
 # Lazy imports to fail fast on missing deps
 try:
-    from playwright.sync_api import sync_playwright
+    from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
     from playwright_stealth import Stealth
 except ImportError as e:
     print(f"Missing dependency: {e}")
     print("Install: pip install playwright playwright-stealth")
     sys.exit(1)
 
+# Optional: inotify wakes the MFA wait as soon as the code file is written
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
 CONFIG_FILE = Path(os.environ.get("ATT_CONFIG", Path.home() / ".config" / "att-invoices" / "config.json"))
 
 
@@ -79,6 +85,21 @@ MFA_TIMEOUT = int(_cfg["mfa_timeout"])
 
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# Compound selectors — resolved in one round-trip instead of one per alternative
+DISMISS_SELECTOR = ", ".join([
+    'button:has-text("×")', 'button.close', '[aria-label="Close"]',
+    'button:has-text("No thanks")', 'button:has-text("OK")',
+    'button:has-text("Accept")',
+])
+MFA_SUBMIT_SELECTOR = ", ".join([
+    'button:has-text("Continue")', 'button:has-text("Verify")',
+    'button:has-text("Submit")',
+])
+CODE_INPUT_SELECTOR = 'input[type="tel"], input[placeholder*="code"]'
+# Fallback: first visible text-like input, found in-page in a single call
+FIND_CODE_INPUT_JS = """() => [...document.querySelectorAll('input')].find(
+    i => ['tel', 'text', 'number'].includes(i.type) && i.offsetParent !== null) || null"""
+
 
 def status(msg):
     """Write status for other processes/agents to read."""
@@ -106,104 +127,155 @@ def get_credentials():
         sys.exit(1)
 
 
-def dismiss_modals(page):
+async def dismiss_modals(page):
     """Dismiss AT&T promotional modals and banners."""
-    for sel in ['button:has-text("×")', 'button.close', '[aria-label="Close"]',
-                'button:has-text("No thanks")', 'button:has-text("OK")',
-                'button:has-text("Accept")']:
+    try:
+        candidates = await page.query_selector_all(DISMISS_SELECTOR)
+    except Exception:
+        return
+    for el in candidates:
         try:
-            el = page.query_selector(sel)
-            if el and el.is_visible():
-                el.click(force=True)
-                time.sleep(0.5)
+            if await el.is_visible():
+                await el.click(force=True)
+                await asyncio.sleep(0.5)
         except Exception:
             pass
 
 
-def human_delay(low=0.3, high=1.5):
-    time.sleep(random.uniform(low, high))
+def read_code():
+    """Return the MFA code from CODE_FILE, or None if missing/empty."""
+    if CODE_FILE.exists():
+        return CODE_FILE.read_text().strip() or None
+    return None
+
+
+def wait_for_code(timeout):
+    """Block until CODE_FILE has a code. Returns the code, or None on timeout.
+
+    Uses inotify (Linux + inotify_simple) when available, otherwise polls every 2s.
+    """
+    deadline = time.time() + timeout
+    try:
+        ino = INotify() if INotify else None
+    except OSError:
+        ino = None
+
+    if ino is None:
+        while time.time() < deadline:
+            code = read_code()
+            if code:
+                return code
+            time.sleep(2)
+        return None
+
+    with ino:
+        ino.add_watch(str(OUTPUT_DIR), flags.CLOSE_WRITE | flags.MOVED_TO)
+        code = read_code()  # May have been written before the watch was added
+        while not code:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            events = ino.read(timeout=int(remaining * 1000))
+            if any(ev.name == CODE_FILE.name for ev in events):
+                code = read_code()
+        return code
+
 
+async def human_delay(low=0.3, high=1.5):
+    await asyncio.sleep(random.uniform(low, high))
 
-def human_mouse(page, n=3):
+
+async def human_mouse(page, n=3):
     """Random mouse movements to appear human."""
     for _ in range(n):
-        page.mouse.move(random.randint(100, 1800), random.randint(100, 900))
-        time.sleep(random.uniform(0.15, 0.4))
+        await page.mouse.move(random.randint(100, 1800), random.randint(100, 900))
+        await asyncio.sleep(random.uniform(0.15, 0.4))
+
 
+async def login(skip_mfa=False, page=None):
+    """Log in to AT&T (with MFA unless skip_mfa). Returns True on success.
 
-def login(skip_mfa=False):
+    Pass `page` to run on the caller's CDP connection (e.g. att_download_bills.py
+    --login); otherwise connects to Chrome itself and disconnects when done.
+    """
     username, password = get_credentials()
     CODE_FILE.unlink(missing_ok=True)
 
-    pw = sync_playwright().start()
-    try:
-        browser = pw.chromium.connect_over_cdp(CDP_URL)
-    except Exception as e:
-        print(f"ERROR: Cannot connect to Chrome CDP at {CDP_URL}")
-        print(f"  {e}")
-        print("Run setup_chrome.sh first.")
-        pw.stop()
-        sys.exit(1)
-
-    ctx = browser.contexts[0]
-    page = ctx.pages[0] if ctx.pages else ctx.new_page()
-    Stealth().apply_stealth_sync(page)
+    pw = None
+    if page is None:
+        pw = await async_playwright().start()
+        try:
+            browser = await pw.chromium.connect_over_cdp(CDP_URL)
+        except Exception as e:
+            print(f"ERROR: Cannot connect to Chrome CDP at {CDP_URL}")
+            print(f"  {e}")
+            print("Run setup_chrome.sh first.")
+            await pw.stop()
+            sys.exit(1)
+
+        ctx = browser.contexts[0]
+        page = ctx.pages[0] if ctx.pages else await ctx.new_page()
+    await Stealth().apply_stealth_async(page)
 
     try:
         # Navigate to login
         status("NAVIGATING_TO_LOGIN")
-        page.goto("https://www.att.com/acctmgmt/signin", wait_until="domcontentloaded")
-        time.sleep(random.uniform(6, 9))
-        dismiss_modals(page)
-        human_mouse(page)
+        await page.goto("https://www.att.com/acctmgmt/signin", wait_until="domcontentloaded")
+        await asyncio.sleep(random.uniform(6, 9))
+        await dismiss_modals(page)
+        await human_mouse(page)
 
-        page.screenshot(path=str(OUTPUT_DIR / "step_login.png"))
+        await page.screenshot(path=str(OUTPUT_DIR / "step_login.png"))
         print(f"  URL: {page.url}", flush=True)
 
         # Check for block
-        body = (page.text_content("body") or "").lower()
+        body = (await page.text_content("body") or "").lower()
         if "it's not you" in body:
             status("ERROR_BLOCKED")
-            page.screenshot(path=str(OUTPUT_DIR / "error_blocked.png"))
+            await page.screenshot(path=str(OUTPUT_DIR / "error_blocked.png"))
             return False
 
         # Fill username
         status("ENTERING_USERNAME")
-        uid_field = page.query_selector('input[id="userID"]:not([type="hidden"])')
-        pw_field = page.query_selector('input[type="password"]')
-
-        if uid_field and uid_field.is_visible():
-            uid_field.click(force=True)
-            human_delay()
-            page.type('input[id="userID"]', username, delay=random.randint(70, 120))
-            human_delay(1, 2)
-            page.click('button:has-text("Continue")')
+        uid_field = await page.query_selector('input[id="userID"]:not([type="hidden"])')
+        pw_field = await page.query_selector('input[type="password"]')
+
+        if uid_field and await uid_field.is_visible():
+            await uid_field.click(force=True)
+            await human_delay()
+            await page.type('input[id="userID"]', username, delay=random.randint(70, 120))
+            await human_delay(1, 2)
+            await page.click('button:has-text("Continue")')
             status("USERNAME_SUBMITTED")
-            time.sleep(random.uniform(5, 8))
-            pw_field = page.wait_for_selector('input[type="password"]', timeout=20000)
+            await asyncio.sleep(random.uniform(5, 8))
+            pw_field = await page.wait_for_selector('input[type="password"]', timeout=20000)
         elif pw_field:
             status("USERNAME_PREFILLED")
         else:
-            pw_field = page.wait_for_selector('input[type="password"]', timeout=20000)
+            pw_field = await page.wait_for_selector('input[type="password"]', timeout=20000)
 
         # Fill password
         status("ENTERING_PASSWORD")
-        pw_field.click(force=True)
-        human_delay()
-        page.type('input[type="password"]', password, delay=random.randint(50, 100))
-        human_delay(0.5, 1.5)
-        page.click('button:has-text("Sign in")')
+        await pw_field.click(force=True)
+        await human_delay()
+        await page.type('input[type="password"]', password, delay=random.randint(50, 100))
+        await human_delay(0.5, 1.5)
+        try:
+            async with page.expect_navigation(wait_until="domcontentloaded", timeout=25000):
+                await page.click('button:has-text("Sign in")')
+        except PlaywrightTimeoutError:
+            pass  # No navigation (e.g. inline error) — checks below handle it
         status("SIGN_IN_CLICKED")
-        time.sleep(random.uniform(10, 14))
+        await asyncio.sleep(random.uniform(0.5, 1.5))  # Human-like jitter
 
         # Check for rate limiting
         if "errorCode=902" in page.url:
             status("ERROR_RATE_LIMITED_902")
-            page.screenshot(path=str(OUTPUT_DIR / "error_902.png"))
+            await page.screenshot(path=str(OUTPUT_DIR / "error_902.png"))
             print("Rate limited by AT&T. Wait 30+ minutes before retrying.", flush=True)
             return False
 
-        body = (page.text_content("body") or "").lower()
+        body = (await page.text_content("body") or "").lower()
         if "it's not you" in body:
             status("ERROR_BLOCKED")
             return False
@@ -211,7 +283,7 @@ def login(skip_mfa=False):
         # Check if logged in without MFA
         if "acctmgmt" in page.url and "signin" not in page.url:
             status("LOGGED_IN")
-            page.screenshot(path=str(OUTPUT_DIR / "step_loggedin.png"))
+            await page.screenshot(path=str(OUTPUT_DIR / "step_loggedin.png"))
             print(f"  Logged in (no MFA): {page.url}", flush=True)
             return True
 
@@ -221,53 +293,45 @@ def login(skip_mfa=False):
 
         # MFA flow
         status("MFA_PAGE")
-        time.sleep(5)
-        page.wait_for_load_state("domcontentloaded")
-        page.screenshot(path=str(OUTPUT_DIR / "step_mfa.png"))
+        await asyncio.sleep(5)
+        await page.wait_for_load_state("domcontentloaded")
+        await page.screenshot(path=str(OUTPUT_DIR / "step_mfa.png"))
 
         # Select phone number
         if MFA_PHONE_HINT:
-            phone_opt = page.query_selector(f'text={MFA_PHONE_HINT}')
+            phone_opt = await page.query_selector(f'text={MFA_PHONE_HINT}')
             if not phone_opt:
                 status("ERROR_NO_MFA_PHONE")
-                page.screenshot(path=str(OUTPUT_DIR / "error_no_mfa_phone.png"))
+                await page.screenshot(path=str(OUTPUT_DIR / "error_no_mfa_phone.png"))
                 print(f"Could not find MFA option with '{MFA_PHONE_HINT}'", flush=True)
                 print("Set mfa_phone in config or pass --mfa-phone=XXXX", flush=True)
                 return False
         else:
             # No phone hint configured — click the first radio/option
-            phone_opt = page.query_selector('input[type="radio"]')
+            phone_opt = await page.query_selector('input[type="radio"]')
             if not phone_opt:
                 status("ERROR_NO_MFA_OPTIONS")
-                page.screenshot(path=str(OUTPUT_DIR / "error_no_mfa_options.png"))
+                await page.screenshot(path=str(OUTPUT_DIR / "error_no_mfa_options.png"))
                 print("No MFA phone options found. Set --mfa-phone=XXXX", flush=True)
                 return False
             print("No mfa_phone configured — using first available option", flush=True)
 
-        phone_opt.click()
-        time.sleep(1)
-        send_btn = page.query_selector('button:has-text("Send")')
+        await phone_opt.click()
+        await asyncio.sleep(1)
+        send_btn = await page.query_selector('button:has-text("Send")')
         if not send_btn:
             status("ERROR_NO_SEND_BUTTON")
             return False
 
-        send_btn.click()
+        await send_btn.click()
         status("MFA_CODE_SENT")
-        time.sleep(5)
-        page.screenshot(path=str(OUTPUT_DIR / "step_mfa_sent.png"))
+        await asyncio.sleep(5)
+        await page.screenshot(path=str(OUTPUT_DIR / "step_mfa_sent.png"))
         print(f"  MFA code sent to phone ending in {MFA_PHONE_HINT}", flush=True)
         print(f"  Waiting for code in {CODE_FILE} (timeout: {MFA_TIMEOUT}s)...", flush=True)
 
-        # Poll for code
-        start = time.time()
-        code = None
-        while time.time() - start < MFA_TIMEOUT:
-            if CODE_FILE.exists():
-                code = CODE_FILE.read_text().strip()
-                if code:
-                    break
-            time.sleep(2)
-
+        # Wait for code
+        code = await asyncio.to_thread(wait_for_code, MFA_TIMEOUT)
         if not code:
             status("ERROR_MFA_TIMEOUT")
             print("MFA code not received in time.", flush=True)
@@ -275,46 +339,39 @@ def login(skip_mfa=False):
 
         # Enter code
         status("ENTERING_MFA_CODE")
-        code_input = (page.query_selector('input[type="tel"]') or
-                      page.query_selector('input[placeholder*="code"]'))
+        code_input = await page.query_selector(CODE_INPUT_SELECTOR)
         if not code_input:
-            for inp in page.query_selector_all('input'):
-                if inp.is_visible() and page.evaluate("e => e.type", inp) in ("tel", "text", "number"):
-                    code_input = inp
-                    break
+            code_input = (await page.evaluate_handle(FIND_CODE_INPUT_JS)).as_element()
 
         if not code_input:
             status("ERROR_NO_CODE_INPUT")
-            page.screenshot(path=str(OUTPUT_DIR / "error_no_code_input.png"))
+            await page.screenshot(path=str(OUTPUT_DIR / "error_no_code_input.png"))
             return False
 
-        code_input.click(force=True)
-        human_delay(0.2, 0.5)
-        code_input.type(code, delay=random.randint(70, 110))
-        time.sleep(1)
+        await code_input.click(force=True)
+        await human_delay(0.2, 0.5)
+        await code_input.type(code, delay=random.randint(70, 110))
+        await asyncio.sleep(1)
 
         # Submit
-        for sel in ['button:has-text("Continue")', 'button:has-text("Verify")', 'button:has-text("Submit")']:
-            btn = page.query_selector(sel)
-            if btn and btn.is_visible():
-                btn.click(force=True)
-                break
+        btn = page.locator(f"{MFA_SUBMIT_SELECTOR} >> visible=true").first
+        if await btn.count():
+            await btn.click(force=True)
 
         status("MFA_SUBMITTED")
         try:
-            page.wait_for_url("**/acctmgmt/**", timeout=30000)
+            await page.wait_for_url("**/acctmgmt/**", timeout=30000)
         except Exception:
             pass
-        time.sleep(5)
 
         if "acctmgmt" in page.url and "signin" not in page.url:
             status("LOGGED_IN")
-            page.screenshot(path=str(OUTPUT_DIR / "step_loggedin.png"))
+            await page.screenshot(path=str(OUTPUT_DIR / "step_loggedin.png"))
             print(f"  Successfully logged in: {page.url}", flush=True)
             return True
         else:
             status("ERROR_LOGIN_FAILED")
-            page.screenshot(path=str(OUTPUT_DIR / "error_login_failed.png"))
+            await page.screenshot(path=str(OUTPUT_DIR / "error_login_failed.png"))
             print(f"  Login may have failed. URL: {page.url}", flush=True)
             return False
 
@@ -322,17 +379,18 @@ def login(skip_mfa=False):
         status(f"ERROR_{type(e).__name__}")
         print(f"Exception: {e}", flush=True)
         try:
-            page.screenshot(path=str(OUTPUT_DIR / "error_exception.png"))
+            await page.screenshot(path=str(OUTPUT_DIR / "error_exception.png"))
         except Exception:
             pass
         return False
 
     finally:
         # IMPORTANT: pw.stop() NOT browser.close() — don't kill Chrome!
-        pw.stop()
+        if pw:
+            await pw.stop()
 
 
 if __name__ == "__main__":
     skip = "--skip-mfa" in sys.argv
-    success = login(skip_mfa=skip)
+    success = asyncio.run(login(skip_mfa=skip))
     sys.exit(0 if success else 1)
@@ -23,17 +23,23 @@ Usage:
   # Full flow: upload → create from wallet → adjust → submit
   python3 certify_expenses.py full --receipts /path/to/*.pdf --confirm
 """
-import os, sys, time, random, json, argparse, glob
+from __future__ import annotations
+
+import os, re, sys, time, random, json, argparse, collections, contextlib, html, mimetypes, queue, threading, weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from playwright.sync_api import Locator
 
+# Optional: lets upload-receipts POST the form directly instead of driving the page
 try:
-    from playwright.sync_api import sync_playwright
-    from playwright_stealth import Stealth
-except ImportError as e:
-    print(f"Missing dependency: {e}")
-    print("Install: pip install playwright playwright-stealth")
-    sys.exit(1)
+    import requests
+except ImportError:
+    requests = None
 
 CONFIG_FILE = Path(os.environ.get(
     "CERTIFY_CONFIG",
@@ -58,6 +64,11 @@ def load_config():
         ],
         "months_back": 2,
         "reimbursable": True,
+        "upload_tabs": 4,        # receipts uploaded concurrently (one tab each)
+        "http_upload": False,    # POST receipts directly (needs `requests`); opt-in
+        "create_tabs": 1,        # expenses created concurrently (one tab each)
+        "login_check_ttl": 600,  # seconds a passed login check is trusted for
+        "delay_profile": "normal",  # human pauses: "off", "fast" or "normal"
     }
     if CONFIG_FILE.exists():
         cfg.update(json.loads(CONFIG_FILE.read_text()))
@@ -68,6 +79,7 @@ def load_config():
         "CERTIFY_VENDOR": "vendor",
         "CERTIFY_LOCATION": "location",
         "CERTIFY_MONTHLY_LIMIT": "monthly_limit",
+        "CERTIFY_DELAY_PROFILE": "delay_profile",
     }.items():
         val = os.environ.get(env_key)
         if val:
@@ -76,53 +88,326 @@ def load_config():
 
 _cfg = load_config()
 CDP_URL = _cfg["cdp_url"]
-OUTPUT_DIR = Path(_cfg["output_dir"])
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+STEALTH = None  # set by load_playwright(); evasion scripts are assembled once per process
 
-# ─── Browser Helpers ─────────────────────────────────────────────────────────
 
-def human_delay(low=0.3, high=1.5):
-    time.sleep(random.uniform(low, high))
+def load_playwright():
+    """
+    Import Playwright and playwright-stealth on first connect rather than at
+    import, so --help and argument errors don't pay for loading them.
+    """
+    global sync_playwright, PlaywrightTimeoutError, STEALTH
+    if STEALTH is not None:
+        return
+    try:
+        from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+        from playwright_stealth import Stealth
+    except ImportError as e:
+        print(f"Missing dependency: {e}")
+        print("Install: pip install playwright playwright-stealth")
+        sys.exit(1)
+    STEALTH = Stealth()
 
 
-def connect_browser():
-    """Connect to Chrome via CDP. Returns (pw, page)."""
+def start_and_connect():
+    """Start Playwright and attach to Chrome. Returns (pw, browser or the connect error)."""
+    load_playwright()
     pw = sync_playwright().start()
     try:
-        browser = pw.chromium.connect_over_cdp(CDP_URL)
+        return pw, pw.chromium.connect_over_cdp(CDP_URL)
     except Exception as e:
-        print(f"ERROR: Cannot connect to Chrome CDP at {CDP_URL}: {e}")
+        return pw, e
+
+
+OUTPUT_DIR = Path(_cfg["output_dir"])
+OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+DELAY_SCALE = {"off": 0.0, "fast": 0.5, "normal": 1.0}.get(_cfg["delay_profile"], 1.0)
+DEBUG = bool(os.environ.get("CERTIFY_DEBUG"))  # step screenshots; set by --debug too
+SESSION_FILE = OUTPUT_DIR / "session_checked.txt"  # mtime = last successful login check
+
+# Expense form fields: each is a tuple of alternatives, most specific first
+DATE_INPUTS = ('#MainContent_ExpEdit_Exp_Date_input', 'input[id*="Exp_Date"]')
+CATEGORY_SELECTS = ('#MainContent_ExpEdit_ExpCat',)
+AMOUNT_INPUTS = ('#igtxtMainContent_ExpEdit_Amount_wneValue', 'input[id*="Amount"][id*="wneValue"]')
+VENDOR_INPUTS = ('#MainContent_ExpEdit_Exp_Vendor_ccsuggestselection_tb_Exp_Vendor',
+                 'input[id*="Vendor"][id*="suggestselection"]')
+LOCATION_INPUTS = ('#MainContent_ExpEdit_Exp_Location_ccsuggestselection_tb_Exp_Location',
+                   'input[id*="Location"][id*="suggestselection"]')
+
+# Fields that postbacks reveal — waited on to detect postback completion
+AMOUNT_INPUT = ", ".join(AMOUNT_INPUTS)
+CATEGORY_SELECT = ", ".join(CATEGORY_SELECTS)
+DATE_INPUT = ", ".join(DATE_INPUTS)
+
+# Buttons, links and inputs the commands act on
+NEW_REPORT_BUTTON = ('a:has-text("New Report"), input[value*="New Report"], '
+                     '#MainContent_btnNewReport, a[id*="NewReport"]')
+ADD_EXPENSE_BUTTON = ('a:has-text("Add Expense"), input[value*="Add Expense"], '
+                      '#MainContent_btnAddExpense, a[id*="AddExpense"]')
+SAVE_BUTTON = ('#MainContent_ExpEdit_btnSave, input[value="Save"], '
+               'a:has-text("Save"), button:has-text("Save")')
+SUBMIT_BUTTON = ('#MainContent_btnSubmit, input[value*="Submit"], '
+                 'a:has-text("Submit"), button:has-text("Submit")')
+EDIT_LINKS = 'a[id*="EditItem"], a[id*="lnkEdit"]'
+FILE_INPUT = ('#MainContent_CertifyWalletSelect_FileUpload2, input[type="file"], '
+              'input[id*="FileUpload"]')
+UPLOAD_BUTTON = ('#MainContent_CertifyWalletSelect_btnUploadMini, '
+                 'input[value*="Upload"], button:has-text("Upload"), a:has-text("Upload")')
+
+# Page anchors — an element whose presence means the page is ready to use
+REPORT_LIST_READY = f'{NEW_REPORT_BUTTON}, input[type="password"]'
+REPORT_VIEW_READY = ('#MainContent_gvExpenses, #MainContent_btnAddExpense, '
+                     'a[id*="AddExpense"], #MainContent_btnSubmit')
+ADD_RECEIPTS_READY = FILE_INPUT
+
+# Wallet receipt picker shown by "Add Expense", and its confirm button
+WALLET_ITEMS = ('.wallet-item, .receipt-thumb, div[id*="Wallet"] .rv_item, '
+                'div[id*="receipt"] a, .rv_item, div.receiptItem')
+SELECT_RECEIPT_BUTTON = ('button:has-text("Select"), input[value="Select"], '
+                         'a:has-text("Use This"), button:has-text("Attach"), '
+                         'input[value*="Select"]')
+
+# A stable key per wallet receipt (element id, data id, or thumbnail URL), null
+# when the item carries none
+WALLET_IDS_JS = """items => items.map(e => e.id || e.dataset.id || e.dataset.receiptId ||
+    (e.querySelector('img') || {}).src || null)"""
+
+# ─── Browser Helpers ─────────────────────────────────────────────────────────
+
+def human_delay(low=0.3, high=0.8):
+    """One human pause at a user-visible action boundary, scaled by DELAY_SCALE."""
+    if DELAY_SCALE:
+        time.sleep(random.uniform(low, high) * DELAY_SCALE)
+
+
+def connect_browser(page=None):
+    """
+    Connect to Chrome via CDP. Returns (pw, page).
+    If `page` is given (a connection shared by cmd_full), returns (None, page)
+    and the caller owns neither connecting nor disconnecting.
+    """
+    if page is not None:
+        return None, page
+    pw, browser = start_and_connect()
+    if isinstance(browser, Exception):
+        print(f"ERROR: Cannot connect to Chrome CDP at {CDP_URL}: {browser}")
         print("Run setup_chrome.sh and certify_login.py first.")
         pw.stop()
         sys.exit(1)
     ctx = browser.contexts[0]
+    # Once per connection, on the context: every tab opened later
+    # (upload / create workers) gets it too, and nothing is re-applied per page
+    STEALTH.apply_stealth_sync(ctx)
     page = ctx.pages[0] if ctx.pages else ctx.new_page()
-    Stealth().apply_stealth_sync(page)
     return pw, page
 
 
+def snap(page, name):
+    """Save a progress screenshot — only with --debug / CERTIFY_DEBUG."""
+    if DEBUG:
+        page.screenshot(path=str(OUTPUT_DIR / name))
+
+
+class NotLoggedIn(Exception):
+    """A navigation ended on Certify's sign-in page."""
+
+
+def on_login_page(page, check_form=False):
+    """
+    True if `page` was sent to sign-in (by URL, or with `check_form` by a
+    password field on the page); also drops the cached login check.
+    """
+    url = page.url.lower()
+    if "login" in url or "signin" in url or (check_form and page.locator('input[type="password"]').count()):
+        SESSION_FILE.unlink(missing_ok=True)
+        return True
+    return False
+
+
+def goto_ready(page, url, anchor, state="visible", timeout=10):
+    """
+    Navigate to `url` and wait for `anchor` rather than a fixed sleep.
+    Raises NotLoggedIn if Certify redirects to sign-in (e.g. the session expired
+    within the login-check TTL), so commands stop here rather than mid-form.
+    """
+    page.goto(url, wait_until="domcontentloaded")
+    if not on_login_page(page):  # Server-side redirect: no need to wait for the anchor
+        try:
+            page.wait_for_selector(anchor, state=state, timeout=timeout * 1000)
+        except PlaywrightTimeoutError:
+            pass
+    # Checked again once the anchor resolved, to catch script redirects after DOM ready
+    if on_login_page(page, check_form=True):
+        raise NotLoggedIn("Session expired. Run certify_login.py first.")
+
+
+def click_first(page, selector, timeout=10):
+    """
+    Click the first match of `selector` once it is actionable (auto-waits up to
+    `timeout` seconds). Returns False if it never showed up.
+    """
+    try:
+        page.locator(selector).first.click(timeout=timeout * 1000)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+@contextlib.contextmanager
+def browser_session():
+    """Connect once for a run of several commands; yields the shared page."""
+    pw, page = connect_browser()
+    try:
+        yield page
+    finally:
+        pw.stop()
+
+
 def ensure_logged_in(page):
-    """Navigate to Certify and verify we're logged in."""
-    page.goto("https://expense.certify.com/ExpRptList.aspx", wait_until="domcontentloaded")
-    time.sleep(3)
-    if "login" in page.url.lower() or "signin" in page.url.lower():
+    """
+    Navigate to Certify and verify we're logged in.
+    A check that passed less than `login_check_ttl` seconds ago (e.g. the
+    previous subcommand) is trusted instead of probing again.
+    """
+    ttl = float(_cfg["login_check_ttl"])
+    try:
+        if time.time() - SESSION_FILE.stat().st_mtime < ttl:
+            return True
+    except FileNotFoundError:
+        pass
+
+    try:
+        goto_ready(page, "https://expense.certify.com/ExpRptList.aspx", REPORT_LIST_READY)
+    except NotLoggedIn:
         print("ERROR: Not logged in. Run certify_login.py first.")
         return False
+    SESSION_FILE.write_text(datetime.now().isoformat())
     return True
 
 
-def wait_for_postback(page, timeout=10):
-    """Wait for ASP.NET postback to complete."""
-    time.sleep(1)
-    try:
-        page.wait_for_load_state("networkidle", timeout=timeout * 1000)
-    except Exception:
-        pass
-    time.sleep(1)
+# True once no UpdatePanel (partial) postback is in flight, or on pages
+# without an ASP.NET ScriptManager
+POSTBACK_DONE_JS = """() => {
+    const prm = window.Sys && Sys.WebForms && Sys.WebForms.PageRequestManager.getInstance();
+    return !prm || !prm.get_isInAsyncPostBack();
+}"""
+
+
+def wait_for_postback(page, timeout=10, selector=None):
+    """
+    Wait for ASP.NET postback to complete.
+    Full postbacks have already started navigating when click() returns, so the
+    load event covers them; partial postbacks are done when PageRequestManager
+    says so. Certify's background polling keeps the network busy, so networkidle
+    is never used. Pass `selector` for an element the postback reveals.
+    """
+    for _ in range(2):  # a full postback can swap the document mid-poll; retry once
+        try:
+            page.wait_for_load_state("load", timeout=timeout * 1000)
+            page.wait_for_function(POSTBACK_DONE_JS, timeout=timeout * 1000)
+            break
+        except PlaywrightTimeoutError:
+            break
+        except Exception:
+            continue
+    if selector:
+        try:
+            page.wait_for_selector(selector, state="visible", timeout=timeout * 1000)
+        except Exception:
+            pass
 
 
 # ─── Form Field Helpers ──────────────────────────────────────────────────────
 
+@dataclass
+class FieldLocators:
+    """Expense form locators. Lazy, so built once per page and re-resolved on use."""
+    date: Locator
+    category: Locator
+    amount: Locator
+    vendor: Locator
+    location: Locator
+
+
+# Page → FieldLocators; weak so a closed tab's page isn't kept alive by the cache
+_field_locators = weakref.WeakKeyDictionary()
+
+
+def field_locators(page):
+    """Return the (cached) FieldLocators for `page`."""
+    if page in _field_locators:
+        return _field_locators[page]
+
+    def any_of(selectors):
+        loc = page.locator(selectors[0])
+        for sel in selectors[1:]:
+            loc = loc.or_(page.locator(sel))
+        return loc.first
+
+    fields = _field_locators[page] = FieldLocators(
+        date=any_of(DATE_INPUTS),
+        category=any_of(CATEGORY_SELECTS),
+        amount=any_of(AMOUNT_INPUTS),
+        vendor=any_of(VENDOR_INPUTS),
+        location=any_of(LOCATION_INPUTS),
+    )
+    return fields
+
+
+# Category string → dropdown option value; the option list is the same for every
+# expense, so it is only scanned on the first lookup per category.
+_category_value_cache = {}
+
+# Write several plain inputs in one round-trip: set value, fire input/change/blur,
+# then let the widgets' deferred handlers run before reading each field back
+# (re-queried, in case it was re-rendered; null if the field is missing).
+SET_FIELDS_JS = """async fields => {
+    for (const [sel, value] of fields) {
+        const el = document.querySelector(sel);
+        if (!el) continue;
+        el.focus();
+        el.value = value;
+        for (const t of ['input', 'change', 'blur'])
+            el.dispatchEvent(new Event(t, {bubbles: true}));
+    }
+    await new Promise(r => setTimeout(r, 50));
+    return fields.map(([sel]) => {
+        const el = document.querySelector(sel);
+        return el ? el.value : null;
+    });
+}"""
+
+
+def set_fields(page, fields):
+    """
+    Set plain (non-postback, non-autocomplete) inputs in a single page.evaluate.
+    `fields` is a list of (selector, value); returns the set of selectors whose
+    value did not stick (rejected or reformatted), so callers can fall back to
+    keyboard entry for those.
+    """
+    try:
+        readback = page.evaluate(SET_FIELDS_JS, [[sel, val] for sel, val in fields])
+    except Exception:
+        return {sel for sel, _ in fields}  # e.g. a change handler navigated away
+    return {sel for (sel, val), got in zip(fields, readback) if got != val}
+
+
+# One round-trip for the category dropdown: its current value plus, when
+# `wanted` is given, [text, value] of the first option containing it. Null if
+# the dropdown isn't on the page.
+MATCH_OPTION_JS = """([sel, wanted]) => {
+    const select = document.querySelector(sel);
+    if (!select) return null;
+    let match = null;
+    if (wanted) {
+        wanted = wanted.toLowerCase();
+        for (const o of select.options)
+            if (o.text.toLowerCase().includes(wanted)) { match = [o.text.trim(), o.value]; break; }
+    }
+    return {current: select.value, match};
+}"""
+
+
 def select_category(page, category):
     """
     Select expense category from ASP.NET dropdown.
@@ -131,84 +416,123 @@ def select_category(page, category):
     """
     if not category:
         return False
-    cat_select = page.query_selector('#MainContent_ExpEdit_ExpCat')
-    if not cat_select:
+
+    # Match in the page; only the winning option crosses the wire
+    target_val = _category_value_cache.get(category)
+    state = page.evaluate(MATCH_OPTION_JS, [CATEGORY_SELECT, None if target_val else category])
+    if state is None:
         print("  WARNING: Category dropdown not found")
         return False
-
-    options = page.query_selector_all('#MainContent_ExpEdit_ExpCat option')
-    target_val = None
-    for opt in options:
-        text = opt.text_content().strip()
-        if category.lower() in text.lower():
-            target_val = opt.get_attribute('value')
-            print(f"  Category matched: '{text}' (value={target_val})")
-            break
+    if not target_val and state["match"]:
+        text, target_val = state["match"]
+        _category_value_cache[category] = target_val
+        print(f"  Category matched: '{text}' (value={target_val})")
 
     if not target_val:
         print(f"  WARNING: Category '{category}' not found in dropdown")
         return False
 
-    page.select_option('#MainContent_ExpEdit_ExpCat', target_val)
+    # Re-selecting the category the form already has would only replay the
+    # same postback and get back the same form
+    if state["current"] == target_val:
+        print("  Category already selected — skipping postback")
+        return True
+
+    field_locators(page).category.select_option(target_val)
     print("  Waiting for postback after category select...")
-    wait_for_postback(page, timeout=15)
+    wait_for_postback(page, timeout=15, selector=AMOUNT_INPUT)
     return True
 
 
+# Set the amount through the Infragistics editor's own client API (old igedit_*
+# or Aikido $find) so its internal value and hidden field stay in sync; returns
+# the value the editor reports, or null if no editor object was found.
+SET_AMOUNT_JS = """([sel, amount]) => {
+    const input = document.querySelector(sel);
+    if (!input) return null;
+    const id = input.id.replace(/^igtxt/, '');
+    const ed = (window.igedit_getById && igedit_getById(id)) || (window.$find && $find(id));
+    if (!ed) return null;
+    if (ed.setValue) ed.setValue(amount);
+    else if (ed.set_value) ed.set_value(amount);
+    else return null;
+    input.dispatchEvent(new Event('change', {bubbles: true}));
+    return ed.getValue ? ed.getValue() : ed.get_value();
+}"""
+
+
 def fill_amount(page, amount):
     """
     Fill the Infragistics amount field.
-    CRITICAL: Must use keyboard.type() + Tab, NOT fill().
+    CRITICAL: Must use keyboard.type() + Tab, NOT fill(). The editor's client
+    API is tried first in one round-trip; keystrokes are the fallback.
     """
-    amount_input = page.query_selector(
-        '#igtxtMainContent_ExpEdit_Amount_wneValue, '
-        'input[id*="Amount"][id*="wneValue"]'
-    )
-    if not amount_input:
+    amount_input = field_locators(page).amount
+    if not amount_input.count():
         print("  WARNING: Amount input not found (postback may not have completed)")
         return False
 
+    try:
+        got = page.evaluate(SET_AMOUNT_JS, [AMOUNT_INPUT, amount])
+        if got is not None and abs(float(got) - amount) < 0.005:
+            return True
+    except Exception:
+        pass
+
     amount_input.click()
-    human_delay(0.2, 0.5)
+    human_delay()
     page.keyboard.press("Control+a")
     page.keyboard.press("Delete")
-    human_delay(0.1, 0.3)
     page.keyboard.type(f"{amount:.2f}")
-    human_delay(0.2, 0.5)
     page.keyboard.press("Tab")  # Trigger Infragistics validation
-    human_delay(0.3, 0.6)
+    human_delay()
     return True
 
 
+# Autocomplete suggestion entries, whichever widget rendered them
+SUGGESTIONS = ':is(div.suggestions div, div[id*="suggest"] div, .ac_results li)'
+
+
+def type_and_pick_suggestion(page, field_input, text):
+    """
+    Type into an autocomplete field, wait for the suggestion XHR, then click the
+    matching suggestion (or Tab out if none shows up).
+    """
+    try:
+        with page.expect_response(
+            lambda r: "suggest" in r.url.lower() or "autocomplete" in r.url.lower(),
+            timeout=5000,
+        ):
+            field_input.type(text, delay=random.randint(50, 80))
+    except PlaywrightTimeoutError:
+        pass  # No XHR seen — still check for rendered suggestions below
+
+    suggestion = page.locator(SUGGESTIONS, has_text=text).first
+    try:
+        suggestion.wait_for(state="visible", timeout=2000)
+    except PlaywrightTimeoutError:
+        suggestion = None
+    if suggestion:
+        suggestion.click()
+        human_delay()
+    else:
+        page.keyboard.press("Tab")
+        human_delay()
+
+
 def fill_vendor(page, vendor):
     """Fill vendor autocomplete — type, wait for suggestion, click it."""
     if not vendor:
         return False
-    vendor_input = page.query_selector(
-        '#MainContent_ExpEdit_Exp_Vendor_ccsuggestselection_tb_Exp_Vendor, '
-        'input[id*="Vendor"][id*="suggestselection"]'
-    )
-    if not vendor_input:
+    vendor_input = field_locators(page).vendor
+    if not vendor_input.count():
         print("  WARNING: Vendor input not found")
         return False
 
     vendor_input.click()
-    human_delay(0.2, 0.5)
+    human_delay()
     vendor_input.fill("")
-    vendor_input.type(vendor, delay=random.randint(50, 80))
-    time.sleep(2)  # Wait for autocomplete suggestions
-
-    suggestion = page.query_selector(
-        f'div.suggestions div:has-text("{vendor}"), '
-        f'div[id*="suggest"] div:has-text("{vendor}"), '
-        f'.ac_results li:has-text("{vendor}")'
-    )
-    if suggestion:
-        suggestion.click()
-        human_delay()
-    else:
-        page.keyboard.press("Tab")
-        human_delay()
+    type_and_pick_suggestion(page, vendor_input, vendor)
     return True
 
 
@@ -216,45 +540,31 @@ def fill_location(page, location):
     """Fill location autocomplete (similar to vendor, needs force click)."""
     if not location:
         return False
-    loc_input = page.query_selector(
-        '#MainContent_ExpEdit_Exp_Location_ccsuggestselection_tb_Exp_Location, '
-        'input[id*="Location"][id*="suggestselection"]'
-    )
-    if not loc_input:
+    loc_input = field_locators(page).location
+    if not loc_input.count():
         print("  WARNING: Location input not found")
         return False
 
     loc_input.click(force=True)  # Force — sometimes obscured
-    human_delay(0.2, 0.5)
+    human_delay()
     loc_input.fill("")
-    loc_input.type(location, delay=random.randint(50, 80))
-    time.sleep(2)
-
-    suggestion = page.query_selector(
-        f'div.suggestions div:has-text("{location}"), '
-        f'div[id*="suggest"] div:has-text("{location}"), '
-        f'.ac_results li:has-text("{location}")'
-    )
-    if suggestion:
-        suggestion.click()
-        human_delay()
-    else:
-        page.keyboard.press("Tab")
-        human_delay()
+    type_and_pick_suggestion(page, loc_input, location)
     return True
 
 
 def fill_date(page, date_str):
     """Fill the expense date field (MM/DD/YYYY format)."""
-    date_input = page.query_selector(
-        '#MainContent_ExpEdit_Exp_Date_input, input[id*="Exp_Date"]'
-    )
-    if not date_input:
+    # Fast path: one DOM write; keyboard entry only if the value didn't stick
+    if not set_fields(page, [(DATE_INPUT, date_str)]):
+        return True
+
+    date_input = field_locators(page).date
+    if not date_input.count():
         print("  WARNING: Date input not found")
         return False
 
     date_input.click()
-    human_delay(0.2, 0.5)
+    human_delay()
     page.keyboard.press("Control+a")
     page.keyboard.type(date_str)
     page.keyboard.press("Tab")
@@ -262,9 +572,166 @@ def fill_date(page, date_str):
     return True
 
 
+# Date (plain input) and amount (Infragistics editor) in a single round-trip;
+# the date readback waits out SET_FIELDS_JS's tick, the amount is set meanwhile
+FILL_DATE_AMOUNT_JS = f"""async ([fields, amount]) => {{
+    const dates = ({SET_FIELDS_JS})(fields);
+    const amountBack = ({SET_AMOUNT_JS})(amount);
+    return [await dates, amountBack];
+}}"""
+
+
+def fill_date_and_amount(page, date_str, amount):
+    """
+    Set date and amount with one page.evaluate once the category postback has
+    settled; whichever didn't take falls back to its own helper.
+    Returns (date_ok, amount_ok).
+    """
+    try:
+        (date_back,), amount_back = page.evaluate(
+            FILL_DATE_AMOUNT_JS, [[[DATE_INPUT, date_str]], [AMOUNT_INPUT, amount]])
+    except Exception:
+        date_back = amount_back = None
+
+    try:
+        amount_set = amount_back is not None and abs(float(amount_back) - amount) < 0.005
+    except (TypeError, ValueError):
+        amount_set = False  # "" or a formatted "$100.00" — let fill_amount redo it
+
+    date_ok = date_back == date_str or fill_date(page, date_str)
+    amount_ok = amount_set or fill_amount(page, amount)
+    return date_ok, amount_ok
+
+
+def start_upload(page, filepath):
+    """
+    Pick a receipt file (or a list, if the input is `multiple`) on an AddReceipts
+    page and trigger the upload postback without waiting for it.
+    Returns how it was submitted, or None on failure.
+    """
+    # Find file input (may be hidden — set_input_files works on hidden inputs)
+    file_input = page.query_selector(FILE_INPUT)
+    if not file_input:
+        print(f"  ERROR: No file input found on page")
+        page.screenshot(path=str(OUTPUT_DIR / f"error_no_file_input.png"))
+        return None
+
+    file_input.set_input_files(filepath)
+
+    # Click upload button (may be hidden — force-show via JS). Picking a file can
+    # render it, so give it a moment to be attached rather than sleeping.
+    try:
+        page.wait_for_selector(UPLOAD_BUTTON, state="attached", timeout=2000)
+    except PlaywrightTimeoutError:
+        pass
+    upload_btn = page.query_selector(UPLOAD_BUTTON)
+    if upload_btn:
+        page.evaluate("""btn => {
+            btn.style.display = 'inline-block';
+            btn.style.visibility = 'visible';
+            btn.style.opacity = '1';
+        }""", upload_btn)
+        upload_btn.click()
+        return "Uploaded"
+    page.evaluate("document.forms[0].submit()")
+    return "Uploaded (form submit)"
+
+
+# ─── Direct HTTP Upload ──────────────────────────────────────────────────────
+
+ADD_RECEIPTS_URL = "https://expense.certify.com/AddReceipts.aspx"
+
+# Harvest what a manual POST of the AddReceipts form needs, in one round-trip
+UPLOAD_FORM_JS = """() => {
+    const form = document.forms[0];
+    if (!form) return null;
+    const hidden = {};
+    for (const i of form.querySelectorAll('input[type=hidden]'))
+        if (i.name) hidden[i.name] = i.value;
+    const file = form.querySelector('#MainContent_CertifyWalletSelect_FileUpload2, input[type=file]');
+    const btn = form.querySelector('#MainContent_CertifyWalletSelect_btnUploadMini');
+    const m = btn && /__doPostBack\\('([^']*)'/.exec(btn.getAttribute('href') || '');
+    return {
+        action: form.action,
+        hidden,
+        file: file ? file.name : null,
+        button: btn && btn.name ? [btn.name, btn.value] : null,
+        target: m ? m[1] : '',
+    };
+}"""
+
+HIDDEN_INPUT_RE = re.compile(r'<input\b[^>]*\btype="hidden"[^>]*>', re.I)
+ATTR_RE = re.compile(r'(?<![-\w])(name|value)="([^"]*)"')
+
+
+def parse_hidden_fields(html_text):
+    """Extract hidden input name → value pairs (__VIEWSTATE etc.) from a page."""
+    fields = {}
+    for tag in HIDDEN_INPUT_RE.findall(html_text):
+        attrs = dict(ATTR_RE.findall(tag))
+        if "name" in attrs:
+            fields[attrs["name"]] = html.unescape(attrs.get("value", ""))
+    return fields
+
+
+def upload_via_http(page, files):
+    """
+    Upload receipts by POSTing the AddReceipts form with `requests`, reusing the
+    browser's cookies and user agent. `page` must be on AddReceipts.aspx — its
+    form state seeds the first POST; each response supplies the next __VIEWSTATE.
+    A 200 isn't proof (ASP.NET validation errors are 200s too): an upload only
+    counts once the response lists its filename.
+    Returns (files NOT uploaded, for the browser path; files whose outcome is
+    unknown, which must not be retried blindly).
+    """
+    form = page.evaluate(UPLOAD_FORM_JS)
+    if not form or not form["file"]:
+        print("  Upload form not recognized — using browser upload")
+        return files, []
+
+    session = requests.Session()
+    session.headers["User-Agent"] = page.evaluate("navigator.userAgent")
+    for c in page.context.cookies(form["action"]):
+        session.cookies.set(c["name"], c["value"], domain=c["domain"], path=c["path"])
+
+    hidden = form["hidden"]
+    for n, filepath in enumerate(files):
+        filename = filepath.name
+        data = dict(hidden, __EVENTTARGET=form["target"], __EVENTARGUMENT="")
+        if form["button"]:
+            data[form["button"][0]] = form["button"][1]
+        mime = mimetypes.guess_type(filepath)[0] or "application/octet-stream"
+        try:
+            with open(filepath, "rb") as fh:
+                r = session.post(form["action"], data=data, timeout=60,
+                                 files={form["file"]: (filename, fh, mime)})
+            r.raise_for_status()
+        except requests.ReadTimeout:
+            # The server may well have stored it — a browser retry could duplicate it
+            print(f"  HTTP upload of {filename} timed out awaiting the response — not retrying")
+            return files[n + 1:], [filepath]
+        except (requests.RequestException, OSError) as e:
+            print(f"  HTTP upload failed for {filename} ({e}) — falling back to browser")
+            return files[n:], []
+        if "login" in r.url.lower() or "signin" in r.url.lower():
+            print(f"  HTTP upload bounced to login for {filename} — falling back to browser")
+            return files[n:], []
+        if filename not in r.text and html.escape(filename) not in r.text:
+            print(f"  HTTP upload of {filename} not confirmed by the response — not retrying")
+            return files[n + 1:], [filepath]
+
+        print(f"  ✓ Uploaded (HTTP): {filename}")
+        new_hidden = parse_hidden_fields(r.text)
+        if "__VIEWSTATE" not in new_hidden:
+            print("  Could not read next form state — uploading the rest via browser")
+            return files[n + 1:], []
+        hidden.update(new_hidden)
+    return [], []
+
+
 # ─── Commands ────────────────────────────────────────────────────────────────
 
-def cmd_upload_receipts(args):
+def cmd_upload_receipts(args, page=None):
     """
     STEP 1: Upload receipt PDFs to the Certify Wallet.
     This must be done BEFORE creating expenses.
@@ -274,10 +741,14 @@ def cmd_upload_receipts(args):
         print("No receipts specified. Use --receipts /path/to/*.pdf")
         return False
 
-    files = []
+    # One pass per pattern (absolute, relative or **); overlapping globs are
+    # de-duplicated and the newest receipts go first
+    found = set()
     for r in receipts:
-        files.extend(glob.glob(r))
-    files = [f for f in files if os.path.isfile(f)]
+        pattern = Path(r).expanduser()
+        root = Path(pattern.anchor) if pattern.is_absolute() else Path()
+        found.update(p for p in root.glob(str(pattern.relative_to(root))) if p.is_file())
+    files = sorted(found, key=lambda p: p.stat().st_mtime, reverse=True)
 
     if not files:
         print(f"No files found matching: {receipts}")
@@ -285,58 +756,79 @@ def cmd_upload_receipts(args):
 
     print(f"Uploading {len(files)} receipt(s) to Certify Wallet...")
 
-    pw, page = connect_browser()
+    pw, page = connect_browser(page)
+    tabs = [page]
     try:
-        if not ensure_logged_in(page):
+        if pw and not ensure_logged_in(page):
             return False
 
         # Navigate to Add Receipts / Wallet page
-        page.goto("https://expense.certify.com/AddReceipts.aspx", wait_until="domcontentloaded")
-        time.sleep(3)
-        page.screenshot(path=str(OUTPUT_DIR / "step_wallet.png"))
-
-        for filepath in files:
-            filename = os.path.basename(filepath)
-            print(f"\n  Uploading: {filename}")
-
-            # Find file input (may be hidden — set_input_files works on hidden inputs)
-            file_input = page.query_selector(
-                '#MainContent_CertifyWalletSelect_FileUpload2, '
-                'input[type="file"], '
-                'input[id*="FileUpload"]'
-            )
-            if not file_input:
-                print(f"  ERROR: No file input found on page")
-                page.screenshot(path=str(OUTPUT_DIR / f"error_no_file_input.png"))
+        # The file input is hidden, so wait for it to exist rather than show
+        goto_ready(page, ADD_RECEIPTS_URL, ADD_RECEIPTS_READY, state="attached")
+        snap(page, "step_wallet.png")
+
+        # Fast path: POST the form directly; the browser handles whatever is left
+        unconfirmed = []
+        if requests is not None and _cfg["http_upload"]:
+            files, unconfirmed = upload_via_http(page, files)
+            if unconfirmed:
+                print(f"\nCheck the wallet before re-uploading (outcome unknown): "
+                      f"{', '.join(f.name for f in unconfirmed)}")
+            if not files:
+                if not unconfirmed:
+                    print(f"\nAll receipts uploaded to wallet.")
+                return not unconfirmed
+            goto_ready(page, ADD_RECEIPTS_URL, ADD_RECEIPTS_READY, state="attached")
+
+        # If the wallet's file input takes several files, one postback uploads them all
+        if len(files) > 1 and page.evaluate("sel => !!document.querySelector(sel)?.multiple", FILE_INPUT):
+            print(f"\n  Uploading {len(files)} receipts in one postback")
+            how = start_upload(page, files)
+            if how:
+                wait_for_postback(page, timeout=60)
+                print(f"  ✓ {how}: {', '.join(f.name for f in files)}")
+                snap(page, "step_uploaded_all.png")
+                if not unconfirmed:
+                    print(f"\nAll receipts uploaded to wallet.")
+                return not unconfirmed
+            goto_ready(page, ADD_RECEIPTS_URL, ADD_RECEIPTS_READY, state="attached")
+
+        # A pool of tabs, all on the Add Receipts / Wallet page. The sync API is
+        # single-threaded, so every idle tab starts its postback before the
+        # oldest in-flight upload is waited on; its tab then takes the next file.
+        n_tabs = max(1, min(int(_cfg["upload_tabs"]), len(files)))
+        tabs += [page.context.new_page() for _ in range(n_tabs - 1)]
+        for tab in tabs[1:]:
+            goto_ready(tab, ADD_RECEIPTS_URL, ADD_RECEIPTS_READY, state="attached")
+
+        pending = collections.deque(files)
+        in_flight = collections.deque()  # (tab, filepath, how), oldest first
+        idle = list(tabs)
+        failed = []
+        while pending or in_flight:
+            while idle and pending:
+                tab, filepath = idle.pop(), pending.popleft()
+                print(f"\n  Uploading: {filepath.name}")
+                how = start_upload(tab, filepath)
+                if how:
+                    in_flight.append((tab, filepath, how))
+                else:
+                    failed.append(filepath)
+                    idle.append(tab)
+            if not in_flight:
                 continue
 
-            file_input.set_input_files(filepath)
-            time.sleep(2)
-
-            # Click upload button (may be hidden — force-show via JS)
-            upload_btn = page.query_selector(
-                '#MainContent_CertifyWalletSelect_btnUploadMini, '
-                'input[value*="Upload"], button:has-text("Upload"), '
-                'a:has-text("Upload")'
-            )
-            if upload_btn:
-                page.evaluate("""btn => {
-                    btn.style.display = 'inline-block';
-                    btn.style.visibility = 'visible';
-                    btn.style.opacity = '1';
-                }""", upload_btn)
-                time.sleep(0.5)
-                upload_btn.click()
-                wait_for_postback(page, timeout=15)
-                print(f"  ✓ Uploaded: {filename}")
-            else:
-                page.evaluate("document.forms[0].submit()")
-                wait_for_postback(page, timeout=15)
-                print(f"  ✓ Uploaded (form submit): {filename}")
-
-            page.screenshot(path=str(OUTPUT_DIR / f"step_uploaded_{filename}.png"))
-            time.sleep(2)
+            tab, filepath, how = in_flight.popleft()
+            wait_for_postback(tab, timeout=15)
+            print(f"  ✓ {how}: {filepath.name}")
+            snap(tab, f"step_uploaded_{filepath.name}.png")
+            idle.append(tab)
 
+        if failed:
+            print(f"\n{len(failed)} receipt(s) not uploaded: {', '.join(f.name for f in failed)}")
+            return False
+        if unconfirmed:
+            return False
         print(f"\nAll receipts uploaded to wallet.")
         return True
 
@@ -348,147 +840,236 @@ def cmd_upload_receipts(args):
             pass
         return False
     finally:
+        for tab in tabs[1:]:
+            tab.close()
+        if pw:
+            pw.stop()
+
+
+def plan_expenses(months_back, line_items, monthly_limit, today):
+    """
+    Decide which line items go into which of the last `months_back` months
+    without exceeding `monthly_limit`. Pure — no browser involved.
+    Returns ([(month_key, date_str, item), ...], {month_key: planned total}).
+    """
+    planned = {}   # month_key -> amount planned so far
+    expenses = []  # (month_key, date_str, item)
+    for month_offset in range(months_back):
+        # First of the calendar month `month_offset + 1` months before today
+        year, month0 = divmod(today.year * 12 + today.month - 1 - (month_offset + 1), 12)
+        month_date = today.replace(year=year, month=month0 + 1, day=1)
+        month_key = month_date.strftime("%Y-%m")
+        planned.setdefault(month_key, 0.0)
+
+        for item in line_items:
+            if planned[month_key] + item["amount"] > monthly_limit:
+                print(f"  Skipping {item['description']} for {month_key} — would exceed ${monthly_limit}/mo limit")
+                continue
+
+            # Determine expense date
+            if "cell" in item["description"].lower() or "phone" in item["description"].lower():
+                exp_day = 5
+            elif "internet" in item["description"].lower():
+                exp_day = 17
+            else:
+                exp_day = 15
+            exp_date = month_date.replace(day=exp_day)
+            date_str = exp_date.strftime("%-m/%-d/%Y")
+
+            expenses.append((month_key, date_str, item))
+            planned[month_key] += item["amount"]
+    return expenses, planned
+
+
+# Guards `claimed` receipt sets shared between create tabs
+_wallet_lock = threading.Lock()
+
+
+def claim_wallet_item(ids, claimed):
+    """
+    Index of the wallet receipt to attach, or None. Alone (`claimed` None) that's
+    the first one; concurrent tabs each claim a distinct receipt key so no two
+    attach the same receipt, however the wallet list shifts underneath them.
+    """
+    if claimed is None:
+        return 0
+    with _wallet_lock:
+        for i, key in enumerate(ids):
+            if key and key not in claimed:
+                claimed.add(key)
+                return i
+    return None
+
+
+def add_expense(page, item, date_str, category, vendor, location, claimed=None):
+    """
+    Add one expense from a wallet receipt on the open report and adjust its fields.
+    `claimed` is the set of receipt keys already taken when several tabs run.
+    """
+    print(f"\n  Adding expense: {date_str} — {item['description']} — ${item['amount']:.2f}")
+
+    # Click "Add Expense" — this should show wallet/receipt selection
+    if click_first(page, ADD_EXPENSE_BUTTON):
+        wait_for_postback(page, selector=f"{WALLET_ITEMS}, {CATEGORY_SELECT}")
+
+    # Check if wallet/receipt selector appeared
+    # If there's a wallet modal or receipt selection panel, pick from it
+    wallet_items = page.query_selector_all(WALLET_ITEMS)
+    pick = None
+    if wallet_items:
+        ids = page.eval_on_selector_all(WALLET_ITEMS, WALLET_IDS_JS)
+        pick = claim_wallet_item(ids, claimed)
+        if pick is None:
+            print(f"  WARNING: No unclaimed wallet receipt among {len(wallet_items)} — adding without one")
+    if pick is not None:
+        print(f"  Found {len(wallet_items)} wallet item(s) — selecting #{pick + 1}")
+        wallet_items[pick].click()
+        try:
+            page.wait_for_selector(f"{SELECT_RECEIPT_BUTTON}, {DATE_INPUT}", timeout=5000)
+        except PlaywrightTimeoutError:
+            pass
+
+        # Confirm selection if needed
+        # Already waited for above, so don't linger if it isn't there
+        if click_first(page, SELECT_RECEIPT_BUTTON, timeout=1):
+            wait_for_postback(page, selector=DATE_INPUT)
+
+    # Now we should be on the expense edit form — adjust fields
+    # Order matters: Category (postback!) → Date + Amount → Vendor → Location
+    if category:
+        if not select_category(page, category):
+            print("  WARNING: Could not select category, continuing anyway")
+
+    date_ok, amount_ok = fill_date_and_amount(page, date_str, item["amount"])
+    if not amount_ok:
+        print("  WARNING: Could not fill amount")
+
+    if vendor:
+        fill_vendor(page, vendor)
+    if location:
+        fill_location(page, location)
+
+    # Save the expense
+    if click_first(page, SAVE_BUTTON):
+        wait_for_postback(page, timeout=10)
+        print(f"  ✓ Saved")
+
+
+def create_expenses_in_tab(report_url, pending, claimed, slot, category, vendor, location):
+    """
+    Worker for create-from-wallet: takes expenses off the shared `pending` queue
+    until it is empty and adds them to the report in its own tab.
+    Sync Playwright objects belong to the thread that created them, so each
+    worker starts its own Playwright and CDP connection to the shared Chrome.
+    Returns the (month_key, item) pairs it added.
+    """
+    pw, browser = start_and_connect()
+    page = None
+    added = []
+    try:
+        if isinstance(browser, Exception):
+            raise browser
+        ctx = browser.contexts[0]
+        STEALTH.apply_stealth_sync(ctx)
+        page = ctx.new_page()
+        goto_ready(page, report_url, REPORT_VIEW_READY)
+        while True:
+            try:
+                month_key, date_str, item = pending.get_nowait()
+            except queue.Empty:
+                break
+            add_expense(page, item, date_str, category, vendor, location, claimed)
+            added.append((month_key, item))
+    except Exception as e:
+        print(f"  Exception in tab {slot + 1}: {e}", flush=True)
+        if page:
+            try:
+                page.screenshot(path=str(OUTPUT_DIR / f"error_create_tab{slot + 1}.png"))
+            except Exception:
+                pass
+    finally:
+        if page:
+            page.close()
         pw.stop()
+    return added
 
 
-def cmd_create_from_wallet(args):
+def cmd_create_from_wallet(args, page=None):
     """
     STEP 2: Create expenses from wallet items.
     Opens wallet, selects each receipt, creates an expense from it,
     and adjusts category/amount/vendor/location per config.
-    Enforces monthly_limit.
+    Enforces monthly_limit. The new report's ID is left in args.report_id
+    for later steps of the same run (and in last_report_id.txt for later runs).
     """
     category = args.category or _cfg["category"]
     vendor = args.vendor or _cfg["vendor"]
     location = args.location or _cfg["location"]
     monthly_limit = float(_cfg["monthly_limit"])
     line_items = _cfg["line_items"]
+    months_back = int(args.months_back or _cfg["months_back"])
 
-    pw, page = connect_browser()
+    # Plan every expense against the monthly limit before touching the browser
+    expenses, planned = plan_expenses(months_back, line_items, monthly_limit, datetime.now())
+
+    pw, page = connect_browser(page)
     try:
-        if not ensure_logged_in(page):
+        if pw and not ensure_logged_in(page):
             return False
 
         # Navigate to expense reports list
-        page.goto("https://expense.certify.com/ExpRptList.aspx", wait_until="domcontentloaded")
-        time.sleep(3)
+        goto_ready(page, "https://expense.certify.com/ExpRptList.aspx", REPORT_LIST_READY)
 
         # Create a new report or use existing draft
-        new_report_btn = page.query_selector(
-            'a:has-text("New Report"), input[value*="New Report"], '
-            '#MainContent_btnNewReport, a[id*="NewReport"]'
-        )
-        if new_report_btn:
-            new_report_btn.click()
-            time.sleep(3)
-            page.wait_for_load_state("domcontentloaded")
-
-        page.screenshot(path=str(OUTPUT_DIR / "step_new_report.png"))
+        if click_first(page, NEW_REPORT_BUTTON, timeout=5):
+            wait_for_postback(page, selector=REPORT_VIEW_READY)
+
+        snap(page, "step_new_report.png")
         report_url = page.url
 
         # Save report ID
         report_id = page.url.split("ID=")[-1] if "ID=" in page.url else "unknown"
         (OUTPUT_DIR / "last_report_id.txt").write_text(report_id)
+        args.report_id = report_id
         print(f"Report ID: {report_id}")
 
         # Now add expenses — click "Add Expense" which should show wallet selection
         # The flow: Add Expense → shows wallet receipts → select one → fills expense form
         # Then we adjust the fields
 
-        months_back = int(args.months_back or _cfg["months_back"])
-        today = datetime.now()
-        total = 0.0
-        monthly_totals = {}  # track per-month spending
-
-        for month_offset in range(months_back):
-            month_date = today - timedelta(days=(month_offset + 1) * 30)
-            month_key = month_date.strftime("%Y-%m")
-            monthly_totals.setdefault(month_key, 0.0)
-
-            for item in line_items:
-                if monthly_totals[month_key] + item["amount"] > monthly_limit:
-                    print(f"  Skipping {item['description']} for {month_key} — would exceed ${monthly_limit}/mo limit")
-                    continue
+        # Expenses are independent records, so a pool of up to `create_tabs`
+        # tabs pulls them from a shared queue and adds them concurrently
+        n_tabs = max(1, min(int(_cfg["create_tabs"]), len(expenses)))
+        if n_tabs == 1:
+            added = []
+            for month_key, date_str, item in expenses:
+                add_expense(page, item, date_str, category, vendor, location)
+                added.append((month_key, item))
+        else:
+            pending = queue.SimpleQueue()
+            for expense in expenses:
+                pending.put(expense)
+            claimed = set()
+            with ThreadPoolExecutor(max_workers=n_tabs) as pool:
+                results = pool.map(
+                    lambda slot: create_expenses_in_tab(report_url, pending, claimed, slot,
+                                                        category, vendor, location),
+                    range(n_tabs))
+                added = [a for r in results for a in r]
+            page.reload(wait_until="domcontentloaded")
 
-                # Determine expense date
-                if "cell" in item["description"].lower() or "phone" in item["description"].lower():
-                    exp_day = 5
-                elif "internet" in item["description"].lower():
-                    exp_day = 17
-                else:
-                    exp_day = 15
-                exp_date = month_date.replace(day=min(exp_day, 28))
-                date_str = exp_date.strftime("%-m/%-d/%Y")
-
-                print(f"\n  Adding expense: {date_str} — {item['description']} — ${item['amount']:.2f}")
-
-                # Click "Add Expense" — this should show wallet/receipt selection
-                add_btn = page.query_selector(
-                    'a:has-text("Add Expense"), input[value*="Add Expense"], '
-                    '#MainContent_btnAddExpense, a[id*="AddExpense"]'
-                )
-                if add_btn:
-                    add_btn.click()
-                    time.sleep(3)
-                    page.wait_for_load_state("domcontentloaded")
-
-                # Check if wallet/receipt selector appeared
-                # If there's a wallet modal or receipt selection panel, pick from it
-                wallet_items = page.query_selector_all(
-                    '.wallet-item, .receipt-thumb, div[id*="Wallet"] .rv_item, '
-                    'div[id*="receipt"] a, .rv_item, div.receiptItem'
-                )
-                if wallet_items:
-                    # Select the first unattached wallet receipt
-                    print(f"  Found {len(wallet_items)} wallet item(s) — selecting first available")
-                    wallet_items[0].click()
-                    time.sleep(2)
-
-                    # Confirm selection if needed
-                    select_btn = page.query_selector(
-                        'button:has-text("Select"), input[value="Select"], '
-                        'a:has-text("Use This"), button:has-text("Attach"), '
-                        'input[value*="Select"]'
-                    )
-                    if select_btn:
-                        select_btn.click()
-                        wait_for_postback(page)
-
-                # Now we should be on the expense edit form — adjust fields
-                # Order matters: Date → Category (postback!) → Amount → Vendor → Location
-                fill_date(page, date_str)
-
-                if category:
-                    if not select_category(page, category):
-                        print("  WARNING: Could not select category, continuing anyway")
-
-                if not fill_amount(page, item["amount"]):
-                    print("  WARNING: Could not fill amount")
-
-                if vendor:
-                    fill_vendor(page, vendor)
-                if location:
-                    fill_location(page, location)
-
-                # Save the expense
-                save_btn = page.query_selector(
-                    '#MainContent_ExpEdit_btnSave, input[value="Save"], '
-                    'a:has-text("Save"), button:has-text("Save")'
-                )
-                if save_btn:
-                    save_btn.click()
-                    wait_for_postback(page, timeout=10)
-                    print(f"  ✓ Saved")
-
-                monthly_totals[month_key] += item["amount"]
-                total += item["amount"]
+        total = 0.0
+        monthly_totals = {month_key: 0.0 for month_key in planned}  # track per-month spending
+        for month_key, item in added:
+            monthly_totals[month_key] += item["amount"]
+            total += item["amount"]
 
         print(f"\n{'='*50}")
         print(f"Total expenses added: ${total:.2f}")
         for month, amt in sorted(monthly_totals.items()):
             print(f"  {month}: ${amt:.2f} / ${monthly_limit:.2f}")
         print(f"Report URL: {report_url}")
-        page.screenshot(path=str(OUTPUT_DIR / "step_report_complete.png"))
+        snap(page, "step_report_complete.png")
 
         return True
 
@@ -500,10 +1081,18 @@ def cmd_create_from_wallet(args):
             pass
         return False
     finally:
-        pw.stop()
+        if pw:
+            pw.stop()
+
+
+# (id, href) of each edit link; hrefs resolve to absolute URLs or javascript:
+EDIT_LINKS_JS = "links => links.map(a => [a.id, a.href])"
 
+# Only real expense-edit targets get followed by URL; anything else is skipped
+EDIT_HREF_RE = re.compile(r"ExpEdit|ExpenseEdit|EditItem|[?&]ExpID=", re.I)
 
-def cmd_adjust(args):
+
+def cmd_adjust(args, page=None):
     """Adjust expenses on an existing report (re-apply category/amount/vendor/location)."""
     report_id = args.report_id or (OUTPUT_DIR / "last_report_id.txt").read_text().strip()
     if not report_id or report_id == "unknown":
@@ -515,26 +1104,37 @@ def cmd_adjust(args):
     location = args.location or _cfg["location"]
     monthly_limit = float(_cfg["monthly_limit"])
 
-    pw, page = connect_browser()
+    pw, page = connect_browser(page)
     try:
-        if not ensure_logged_in(page):
+        if pw and not ensure_logged_in(page):
             return False
 
-        page.goto(f"https://expense.certify.com/ExpRptView.aspx?ID={report_id}",
-                   wait_until="domcontentloaded")
-        time.sleep(3)
+        report_url = f"https://expense.certify.com/ExpRptView.aspx?ID={report_id}"
+        goto_ready(page, report_url, REPORT_VIEW_READY)
 
-        # Find all expense rows and edit each one
-        expense_links = page.query_selector_all(
-            'a[id*="EditItem"], a[id*="lnkEdit"], tr[id*="gvExpenses"] a'
-        )
+        # Read every expense row's edit link in one round-trip, then edit each one
+        expense_links = list(dict.fromkeys(map(tuple, page.eval_on_selector_all(
+            EDIT_LINKS, EDIT_LINKS_JS))))
         print(f"Found {len(expense_links)} expense(s) to adjust")
 
-        for i, link in enumerate(expense_links):
+        for i, (link_id, href) in enumerate(expense_links):
             print(f"\n  Adjusting expense {i+1}/{len(expense_links)}...")
-            link.click()
-            time.sleep(3)
-            page.wait_for_load_state("domcontentloaded")
+            if href.startswith("http"):
+                if not EDIT_HREF_RE.search(href):
+                    print(f"  Skipping non-edit link: {href}")
+                    continue
+                page.goto(href, wait_until="domcontentloaded")
+                if on_login_page(page):
+                    raise NotLoggedIn("Session expired. Run certify_login.py first.")
+            elif not link_id:
+                print("  Skipping postback link without an id")
+                continue
+            else:
+                # __doPostBack link — has to be clicked on the report view
+                if "ExpRptView" not in page.url:
+                    goto_ready(page, report_url, REPORT_VIEW_READY)
+                page.click(f'[id="{link_id}"]')
+                wait_for_postback(page, selector=DATE_INPUT)
 
             # Re-apply fields
             if category:
@@ -545,15 +1145,11 @@ def cmd_adjust(args):
             if location:
                 fill_location(page, location)
 
-            save_btn = page.query_selector(
-                '#MainContent_ExpEdit_btnSave, input[value="Save"]'
-            )
-            if save_btn:
-                save_btn.click()
+            if click_first(page, SAVE_BUTTON):
                 wait_for_postback(page)
                 print(f"  ✓ Adjusted expense {i+1}")
 
-        page.screenshot(path=str(OUTPUT_DIR / "step_adjusted.png"))
+        snap(page, "step_adjusted.png")
         return True
 
     except Exception as e:
@@ -564,10 +1160,21 @@ def cmd_adjust(args):
             pass
         return False
     finally:
-        pw.stop()
+        if pw:
+            pw.stop()
+
 
+# Runs before the page's own scripts, which may define customConfirm themselves,
+# so it is installed again once the document has parsed and loaded
+AUTO_CONFIRM_JS = """(() => {
+    const accept = () => { window.customConfirm = () => true; window.confirm = () => true; };
+    accept();
+    document.addEventListener('DOMContentLoaded', accept);
+    window.addEventListener('load', accept);
+})();"""
 
-def cmd_submit(args):
+
+def cmd_submit(args, page=None):
     """Submit an expense report for approval."""
     report_id = args.report_id or (OUTPUT_DIR / "last_report_id.txt").read_text().strip()
     if not report_id or report_id == "unknown":
@@ -581,33 +1188,23 @@ def cmd_submit(args):
 
     print(f"Submitting report {report_id} for approval...")
 
-    pw, page = connect_browser()
+    pw, page = connect_browser(page)
     try:
-        if not ensure_logged_in(page):
+        if pw and not ensure_logged_in(page):
             return False
 
-        page.goto(f"https://expense.certify.com/ExpRptView.aspx?ID={report_id}",
-                   wait_until="domcontentloaded")
-        time.sleep(3)
-
-        # Override confirm dialogs (Certify uses customConfirm)
-        page.evaluate("window.customConfirm = function() { return true; }")
-        page.evaluate("window.confirm = function() { return true; }")
+        # Override confirm dialogs (Certify uses customConfirm) on every document
+        # this page loads from here on, including the postback after the click
+        page.add_init_script(AUTO_CONFIRM_JS)
+        goto_ready(page, f"https://expense.certify.com/ExpRptView.aspx?ID={report_id}",
+                   REPORT_VIEW_READY)
 
-        submit_btn = page.query_selector(
-            '#MainContent_btnSubmit, input[value*="Submit"], '
-            'a:has-text("Submit"), button:has-text("Submit")'
-        )
-        if not submit_btn:
+        if not click_first(page, SUBMIT_BUTTON):
             print("ERROR: Submit button not found")
             page.screenshot(path=str(OUTPUT_DIR / "error_no_submit.png"))
             return False
-
-        submit_btn.click()
-        time.sleep(3)
-        page.evaluate("window.customConfirm = function() { return true; }")
         wait_for_postback(page, timeout=15)
-        page.screenshot(path=str(OUTPUT_DIR / "step_submitted.png"))
+        snap(page, "step_submitted.png")
 
         body = (page.text_content("body") or "").lower()
         if "submitted" in body or "pending" in body or "approval" in body:
@@ -625,7 +1222,8 @@ def cmd_submit(args):
             pass
         return False
     finally:
-        pw.stop()
+        if pw:
+            pw.stop()
 
 
 def cmd_full(args):
@@ -638,36 +1236,52 @@ def cmd_full(args):
     print("  4. Submit for approval")
     print("=" * 60)
 
-    if args.receipts:
-        print("\n[1/4] Uploading receipts to wallet...")
-        if not cmd_upload_receipts(args):
-            print("WARNING: Receipt upload had issues — check wallet manually")
-    else:
-        print("\n[1/4] No receipts specified — assuming already in wallet")
+    # One Playwright, CDP connection and login check shared by all four steps
+    with browser_session() as page:
+        if not ensure_logged_in(page):
+            return False
 
-    print("\n[2/4] Creating expenses from wallet items...")
-    if not cmd_create_from_wallet(args):
-        print("FAILED at create-from-wallet step")
-        return False
+        if args.receipts:
+            print("\n[1/4] Uploading receipts to wallet...")
+            if not cmd_upload_receipts(args, page=page):
+                print("WARNING: Receipt upload had issues — check wallet manually")
+        else:
+            print("\n[1/4] No receipts specified — assuming already in wallet")
 
-    print("\n[3/4] Adjusting expenses...")
-    cmd_adjust(args)  # Best effort — don't fail on adjust issues
+        print("\n[2/4] Creating expenses from wallet items...")
+        if not cmd_create_from_wallet(args, page=page):
+            print("FAILED at create-from-wallet step")
+            return False
 
-    if args.confirm:
-        print("\n[4/4] Submitting for approval...")
-        return cmd_submit(args)
-    else:
-        print("\n[4/4] Skipping submit (add --confirm to auto-submit)")
-        report_id = (OUTPUT_DIR / "last_report_id.txt").read_text().strip()
-        print(f"Review the report, then run:")
-        print(f"  python3 certify_expenses.py submit --report-id {report_id} --confirm")
-        return True
+        print("\n[3/4] Adjusting expenses...")
+        cmd_adjust(args, page=page)  # Best effort — don't fail on adjust issues
+
+        if args.confirm:
+            print("\n[4/4] Submitting for approval...")
+            return cmd_submit(args, page=page)
+        else:
+            print("\n[4/4] Skipping submit (add --confirm to auto-submit)")
+            report_id = args.report_id
+            print(f"Review the report, then run:")
+            print(f"  python3 certify_expenses.py submit --report-id {report_id} --confirm")
+            return True
 
 
 # ─── CLI ─────────────────────────────────────────────────────────────────────
 
+COMMANDS = {
+    "upload-receipts": cmd_upload_receipts,
+    "create-from-wallet": cmd_create_from_wallet,
+    "adjust": cmd_adjust,
+    "submit": cmd_submit,
+    "full": cmd_full,
+}
+
+
 def main():
     parser = argparse.ArgumentParser(description="Certify/Emburse Expense Automation")
+    parser.add_argument("--debug", action="store_true",
+                        help="Save a screenshot after each step (also CERTIFY_DEBUG=1)")
     sub = parser.add_subparsers(dest="command", required=True)
 
     # upload-receipts
@@ -704,16 +1318,10 @@ def main():
     p_full.add_argument("--confirm", action="store_true")
 
     args = parser.parse_args()
+    global DEBUG
+    DEBUG = DEBUG or args.debug
 
-    commands = {
-        "upload-receipts": cmd_upload_receipts,
-        "create-from-wallet": cmd_create_from_wallet,
-        "adjust": cmd_adjust,
-        "submit": cmd_submit,
-        "full": cmd_full,
-    }
-
-    success = commands[args.command](args)
+    success = COMMANDS[args.command](args)
     sys.exit(0 if success else 1)
 
 